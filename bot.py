@@ -1,39 +1,226 @@
-import os, json, asyncio
+import os, re, sys, json, time, pickle, atexit, asyncio, bisect, calendar, heapq, itertools
+from collections import deque
 from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from operator import itemgetter
 from zoneinfo import ZoneInfo
-from typing import Optional, List, Dict, Any, Set, Tuple
+from typing import Optional, List, Dict, Any, Set, FrozenSet, Tuple, Callable
 
 import discord
 from discord.ext import commands
 from discord import app_commands
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ===== ENV =====
 BOT_TOKEN = os.environ["BOT_TOKEN"]
 ERINNERUNGS_CHANNEL_ID = int(os.environ["ERINNERUNGS_CHANNEL_ID"])
 ROLLE_ID = int(os.environ["ROLLE_ID"])
 GUILD_ID = int(os.environ["GUILD_ID"])
 CLEAN_GLOBAL_COMMANDS = os.environ.get("CLEAN_GLOBAL_COMMANDS", "0").strip() == "1"
+DEBUG = os.environ.get("DEBUG", "0").strip() == "1"
+PERSIST_PICKLE = os.environ.get("PERSIST_FORMAT", "json").strip().lower() == "pickle"
 
 TZ = ZoneInfo("Europe/Berlin")
-DATA_FILE = "data.json"
+JSON_FILE = "data.json"
+DATA_FILE = "data.pkl" if PERSIST_PICKLE else JSON_FILE
+ARCHIVE_FILE = "events_archive.json"
 AUTO_DELETE_SECONDS = 900
 CHECK_INTERVAL_SECONDS = 20
+SAVE_DEBOUNCE_SECONDS = 0.25
+SAVE_RETRY_SECONDS = 30
 PAGE_SIZE = 6
+DM_CONCURRENCY = 5
+EMBED_CHARS = 1100
+EMBEDS_PER_MSG = 5
+COMPACT_DAYS = 30
+COMPACT_INTERVAL_SECONDS = 3600
+
+SAVE_LOCK = asyncio.Lock()
 
+RECURRENCES = frozenset(("none","daily","weekly","monthly"))
+SCOPES = frozenset(("public","private","user","role"))
 REC_CHOICES = [app_commands.Choice(name=x, value=x) for x in ("none","daily","weekly","monthly")]
 
 # ===== DATA =====
-def load() -> Dict[str, Any]:
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f: d = json.load(f)
+_data_cache: Optional[Tuple[Optional[int], Dict[str, Any]]] = None
+_pending: Optional[Dict[str, Any]] = None
+_flush_task: Optional[asyncio.Task] = None
+_data_version = 0
+
+def _mtime() -> Optional[int]:
+    try: return os.stat(DATA_FILE).st_mtime_ns
+    except OSError: return None
+
+async def load() -> Dict[str, Any]:
+    global _data_cache, _data_version
+    mtime = _mtime()
+    if not (_data_cache and _data_cache[0] == mtime):
+        d = await asyncio.to_thread(_read_sync)
+        if not (_data_cache and _data_cache[0] == mtime): _data_cache = (mtime, d); _data_version += 1
+    return _data_cache[1]
+
+def _read_sync() -> Dict[str, Any]:
+    try: d = _read_raw()
     except Exception:
         d = {}
-    d.setdefault("events", []); d.setdefault("next_event_id", 1)
+    return _normalize(d)
+
+def _read_raw() -> Dict[str, Any]:
+    with open(DATA_FILE, "rb") as f: raw = f.read()
+    return pickle.loads(raw) if PERSIST_PICKLE else _json_loads(raw)
+
+def _json_loads(raw: bytes) -> Dict[str, Any]:
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+def _normalize(d: Dict[str, Any]) -> Dict[str, Any]:
+    d.setdefault("events", []); d.setdefault("events_archive", []); d.setdefault("next_event_id", 1)
     d.setdefault("todos", []); d.setdefault("next_todo_id", 1)
+    for e in d["events"] + d["events_archive"]:
+        e["id"] = int(e["id"])
+        e["reminders_str"] = rems_str(e.get("reminders", []))
+        e["dt_fmt"] = fmt_dt(from_iso(e["datetime"])); e["ts"] = iso_ts(e["datetime"])
+        rec = (e.get("recurrence") or "none").lower(); e["recurrence"] = sys.intern(rec) if rec in RECURRENCES else "none"
+    for t in d["todos"]:
+        t["id"] = int(t["id"])
+        if (sc := t.get("scope", "public")) in SCOPES: t["scope"] = sys.intern(sc)
+        t["due_fmt"] = fmt_due(t.get("due")); t["due_ts"] = iso_ts(t.get("due"))
+        t["created_ts"] = iso_ts(t.get("created_at"))
+        t["done_ts"] = iso_ts(t.get("done_at")); t["done_fmt"] = fmt_done(t["done_ts"])
+    if any(e.get("cancelled") for e in d["events"]):
+        d["events_archive"] += [e for e in d["events"] if e.get("cancelled")]
+        d["events"] = [e for e in d["events"] if not e.get("cancelled")]
+    d["events"].sort(key=ev_key); d["events_archive"].sort(key=ev_key); d["todos"].sort(key=todo_key)
+    d["_event_idx"] = {e["id"]: e for e in d["events"] + d["events_archive"]}
+    d["_todo_idx"] = {t["id"]: t for t in d["todos"]}
     return d
 
-def save(d: Dict[str, Any]): 
-    with open(DATA_FILE, "w", encoding="utf-8") as f: json.dump(d, f, indent=2, ensure_ascii=False)
+def _dump(d: Dict[str, Any]) -> bytes:
+    d = {k: v for k, v in d.items() if not k.startswith("_")}
+    if PERSIST_PICKLE: return pickle.dumps(d, protocol=pickle.HIGHEST_PROTOCOL)
+    return _json_dump(d, DEBUG)
+
+def _json_dump(d: Dict[str, Any], pretty: bool) -> bytes:
+    if orjson: return orjson.dumps(d, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE if pretty else 0))
+    if pretty: return (json.dumps(d, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+    return json.dumps(d, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def pretty_dump():
+    try: d = _read_raw()
+    except Exception as ex:
+        sys.exit(f"❌ {DATA_FILE} nicht lesbar, nichts geschrieben: {type(ex).__name__}: {ex}")
+    d = {k: v for k, v in _normalize(d).items() if not k.startswith("_")}
+    tmp = JSON_FILE + ".tmp"
+    with open(tmp, "wb") as f: f.write(_json_dump(d, True))
+    os.replace(tmp, JSON_FILE)
+    print(f"📝 {DATA_FILE} → {JSON_FILE} (formatiert)", flush=True)
+
+def _write_sync(d: Dict[str, Any], raw: bytes):
+    global _data_cache
+    tmp = DATA_FILE + ".tmp"
+    with open(tmp, "wb") as f: f.write(raw)
+    os.replace(tmp, DATA_FILE)
+    _data_cache = (os.stat(DATA_FILE).st_mtime_ns, d)
+
+async def save_async(d: Dict[str, Any]):
+    raw = _dump(d)
+    async with SAVE_LOCK: await asyncio.to_thread(_write_sync, d, raw)
+
+def schedule_save(d: Dict[str, Any]):
+    global _pending, _flush_task, _data_version
+    _pending = d; _data_version += 1
+    if _flush_task is None: _flush_task = asyncio.create_task(_flush_later(SAVE_DEBOUNCE_SECONDS))
+
+async def _flush_later(delay: float):
+    global _pending, _flush_task
+    await asyncio.sleep(delay)
+    d, _pending, _flush_task = _pending, None, None
+    try: await save_async(d)
+    except Exception as ex:
+        print(f"❌ Speichern fehlgeschlagen: {type(ex).__name__}: {ex}", flush=True)
+        if _pending is None: _pending = d
+        if _flush_task is None: _flush_task = asyncio.create_task(_flush_later(SAVE_RETRY_SECONDS))
+
+@atexit.register
+def _flush_pending():
+    if _pending is not None: _write_sync(_pending, _dump(_pending))
+
+def migrate_json():
+    if not PERSIST_PICKLE or os.path.exists(DATA_FILE) or not os.path.exists(JSON_FILE): return
+    with open(JSON_FILE, "rb") as f: d = _normalize(_json_loads(f.read()))
+    _write_sync(d, _dump(d))
+    print(f"📦 {JSON_FILE} → {DATA_FILE} migriert", flush=True)
+
+def add_event(d: Dict[str, Any], e: Dict[str, Any]):
+    bisect.insort(d["events"], e, key=ev_key); d["_event_idx"][e["id"]] = e
+
+def add_todo(d: Dict[str, Any], t: Dict[str, Any]):
+    bisect.insort(d["todos"], t, key=todo_key); d["_todo_idx"][t["id"]] = t
+
+def resort_event(d: Dict[str, Any], e: Dict[str, Any]):
+    d["events"].remove(e); bisect.insort(d["events"], e, key=ev_key)
+
+def resort_todo(d: Dict[str, Any], t: Dict[str, Any]):
+    d["todos"].remove(t); bisect.insort(d["todos"], t, key=todo_key)
+
+def set_done(t: Dict[str, Any], done: bool):
+    n = now()
+    t["done"] = done; t["done_at"] = to_iso(n) if done else None; t["done_ts"] = n.timestamp() if done else None
+    t["done_fmt"] = fmt_done(t["done_ts"])
+
+def archive_event(d: Dict[str, Any], e: Dict[str, Any]):
+    e["cancelled"] = True
+    d["events"].remove(e); bisect.insort(d["events_archive"], e, key=ev_key)
+
+def compact(d: Dict[str, Any]) -> Tuple[bool, List[Dict[str, Any]]]:
+    cut = time.time() - COMPACT_DAYS * 86400
+    old_t = [t for t in d["todos"] if t.get("deleted") and (t.get("done_ts") or t.get("created_ts") or 0) < cut]
+    old_e = [e for e in d["events_archive"] if e["ts"] < cut]
+    if old_t:
+        for t in old_t: del d["_todo_idx"][t["id"]]
+        d["todos"] = [t for t in d["todos"] if t["id"] in d["_todo_idx"]]
+    if old_e:
+        for e in old_e: del d["_event_idx"][e["id"]]
+        d["events_archive"] = d["events_archive"][len(old_e):]
+    return bool(old_t or old_e), old_e
+
+def _archived_ids() -> Set[int]:
+    try:
+        with open(ARCHIVE_FILE, "rb") as f: return {_json_loads(l)["id"] for l in filter(bytes.strip, f)}
+    except OSError: return set()
+
+def _append_archive_sync(evs: List[Dict[str, Any]]):
+    seen = _archived_ids(); evs = [e for e in evs if e["id"] not in seen]
+    if not evs: return
+    with open(ARCHIVE_FILE, "ab") as f:
+        f.writelines((orjson.dumps(e) if orjson else json.dumps(e, ensure_ascii=False).encode("utf-8")) + b"\n" for e in evs)
+
+def _read_archive_sync(limit: int) -> List[Dict[str, Any]]:
+    try:
+        with open(ARCHIVE_FILE, "rb") as f: return [_json_loads(l) for l in deque(filter(bytes.strip, f), maxlen=limit)]
+    except OSError: return []
+
+def active_events(d: Dict[str, Any]) -> List[Dict[str, Any]]:
+    evs = d["events"]; return evs[bisect.bisect_left(evs, time.time(), key=ev_key):]
+
+_all_events: Tuple[int, List[Dict[str, Any]]] = (-1, [])
+
+def all_events(d: Dict[str, Any]) -> List[Dict[str, Any]]:
+    global _all_events
+    if _all_events[0] != _data_version: _all_events = (_data_version, list(heapq.merge(d["events_archive"], d["events"], key=ev_key)))
+    return _all_events[1]
+
+_buckets: Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]] = (-1, [], [])
+
+def todo_buckets(d: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    global _buckets
+    if _buckets[0] != _data_version:
+        live = [t for t in d["todos"] if not t.get("deleted")]
+        _buckets = (_data_version, [t for t in live if not t.get("done")], [t for t in live if t.get("done")])
+    return _buckets[1], _buckets[2]
 
 def next_id(d: Dict[str, Any], key: str) -> int:
     nid = int(d.get(key, 1)); d[key] = nid + 1; return nid
@@ -44,64 +231,157 @@ def now() -> datetime: return datetime.now(tz=TZ)
 def to_iso(dt: datetime) -> str:
     return (dt if dt.tzinfo else dt.replace(tzinfo=TZ)).astimezone(TZ).isoformat()
 
+@lru_cache(maxsize=4096)
 def from_iso(s: str) -> datetime:
     dt = datetime.fromisoformat(s)
     return (dt if dt.tzinfo else dt.replace(tzinfo=TZ)).astimezone(TZ)
 
+def iso_ts(s: Optional[str]) -> Optional[float]: return from_iso(s).timestamp() if s else None
+
+INF = float("inf")
+
+ev_key = itemgetter("ts")
+
+def todo_key(t: Dict[str, Any]) -> Tuple[float, float]:
+    due, cr = t.get("due_ts"), t.get("created_ts")
+    return (INF if due is None else due, INF if cr is None else cr)
+
+def done_key(t: Dict[str, Any]) -> float:
+    ts = t.get("done_ts"); return -INF if ts is None else ts
+
+DT_RE = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})\s+(\d{1,2}):(\d{1,2})")
+
 def parse_dt(d: str, t: str) -> datetime:
-    return datetime.strptime(f"{d} {t}", "%d.%m.%Y %H:%M").replace(tzinfo=TZ)
+    m = DT_RE.fullmatch(f"{d} {t}")
+    if not m: raise ValueError(f"ungültiges Datum: {d} {t}")
+    dd, mo, y, h, mi = map(int, m.groups())
+    return datetime(y, mo, dd, h, mi, tzinfo=TZ)
+
+ONE_DAY = timedelta(days=1)
+ONE_WEEK = timedelta(weeks=1)
 
 def add_month(dt: datetime) -> datetime:
-    y, m = dt.year, dt.month + 1
-    if m == 13: y, m = y + 1, 1
-    next_m = datetime(y + (m==12), 1 if m==12 else m+1, 1, tzinfo=dt.tzinfo)
-    last = (next_m - timedelta(days=1)).day
-    return dt.replace(year=y, month=m, day=min(dt.day, last))
+    y, m = (dt.year + 1, 1) if dt.month == 12 else (dt.year, dt.month + 1)
+    return dt.replace(year=y, month=m, day=min(dt.day, calendar.monthrange(y, m)[1]))
+
+REC_NEXT = {"daily": lambda dt: dt + ONE_DAY, "weekly": lambda dt: dt + ONE_WEEK, "monthly": add_month}
 
 def next_occ(dt: datetime, rec: str) -> datetime:
-    return dt + timedelta(days=1) if rec=="daily" else dt + timedelta(weeks=1) if rec=="weekly" else add_month(dt) if rec=="monthly" else dt
+    f = REC_NEXT.get(rec); return f(dt) if f else dt
+
+REM_RE = re.compile(r"(\d+)\s*([mhd]?)", re.I)
+REM_MULT = {"": 1, "m": 1, "h": 60, "d": 1440}
 
 def parse_reminders(s: str) -> List[int]:
-    s = (s or "").strip()
-    if not s: return []
-    out=[]
-    for p in [x.strip().lower() for x in s.split(",") if x.strip()]:
-        if p.endswith("m"): out.append(int(p[:-1]))
-        elif p.endswith("h"): out.append(int(p[:-1]) * 60)
-        elif p.endswith("d"): out.append(int(p[:-1]) * 1440)
-        else: out.append(int(p))
-    return sorted(set(x for x in out if x >= 0), reverse=True)
+    out = set()
+    for p in (s or "").split(","):
+        if not (p := p.strip()): continue
+        m = REM_RE.fullmatch(p)
+        if not m: raise ValueError(f"ungültige Erinnerung: {p}")
+        out.add(int(m[1]) * REM_MULT[m[2].lower()])
+    return sorted(out, reverse=True)
+
+def fmt_dt(dt: datetime) -> str: return f"{dt.day:02d}.{dt.month:02d}.{dt.year} {dt.hour:02d}:{dt.minute:02d}"
+
+@lru_cache(maxsize=1024)
+def _fmt_min(mins: int) -> str: return fmt_dt(datetime.fromtimestamp(mins * 60, TZ))
+
+def fmt_ts(ts: float) -> str: return _fmt_min(int(ts // 60))
 
 def fmt_due(due_iso: Optional[str]) -> str:
     if not due_iso: return ""
-    try: return " · fällig: " + from_iso(due_iso).strftime("%d.%m.%Y %H:%M")
+    try: return " · fällig: " + fmt_dt(from_iso(due_iso))
     except: return ""
 
-def reminder_msg(title: str, dt: datetime, m: int) -> str:
-    return f"🔔 **Erinnerung** ({m} min vorher)\n📌 **{title}**\n🕒 {dt.strftime('%d.%m.%Y %H:%M')} (Berlin)"
+def fmt_done(ts: Optional[float]) -> str:
+    return "" if ts is None else " · erledigt: " + fmt_ts(ts)
+
+def rems_str(rems: List[int]) -> str:
+    return ",".join(map(str, rems)) or "—"
+
+def reminder_msg(title: str, when: str, m: int) -> str:
+    return f"🔔 **Erinnerung** ({m} min vorher)\n📌 **{title}**\n🕒 {when} (Berlin)"
 
 # ===== BOT =====
 intents = discord.Intents.default()
 intents.guilds = True
 intents.members = True
 bot = commands.Bot(command_prefix="!", intents=intents)
+DM_SEM = asyncio.Semaphore(DM_CONCURRENCY)
+_ch_cache: Dict[int, discord.abc.Messageable] = {}
+_user_cache: Dict[int, discord.abc.Messageable] = {}
 
 async def ch_send(cid: int, content: str):
-    ch = bot.get_channel(cid) or await bot.fetch_channel(cid)
-    await ch.send(content, delete_after=AUTO_DELETE_SECONDS)
+    ch = _ch_cache.get(cid)
+    if ch is None: ch = _ch_cache[cid] = bot.get_channel(cid) or await bot.fetch_channel(cid)
+    delete_later(await ch.send(content))
+
+_del_heap: List[Tuple[float, int, discord.Message]] = []
+_del_seq = itertools.count()
+_del_wake = asyncio.Event()
+
+def delete_later(msg: discord.Message, delay: float = AUTO_DELETE_SECONDS):
+    heapq.heappush(_del_heap, (time.monotonic() + delay, next(_del_seq), msg)); _del_wake.set()
+
+async def delete_worker():
+    while not bot.is_closed():
+        _del_wake.clear()
+        while _del_heap and _del_heap[0][0] <= time.monotonic():
+            msg = heapq.heappop(_del_heap)[2]
+            try: await msg.delete()
+            except discord.HTTPException: pass
+            except Exception as ex:
+                print(f"❌ Löschen fehlgeschlagen: {type(ex).__name__}: {ex}", flush=True)
+        wait = _del_heap[0][0] - time.monotonic() if _del_heap else None
+        try: await asyncio.wait_for(_del_wake.wait(), wait)
+        except asyncio.TimeoutError: pass
 
 async def dm_send(uid: int, content: str):
-    u = bot.get_user(uid) or await bot.fetch_user(uid)
-    await u.send(content)
+    async with DM_SEM:
+        u = _user_cache.get(uid)
+        if u is None: u = _user_cache[uid] = bot.get_user(uid) or await bot.fetch_user(uid)
+        await u.send(content)
+
+async def dm_send_all(uids: List[int], content: str):
+    res = await asyncio.gather(*(dm_send(uid, content) for uid in uids), return_exceptions=True)
+    for uid, r in zip(uids, res):
+        if isinstance(r, Exception): print(f"❌ DM an {uid} fehlgeschlagen: {type(r).__name__}: {r}", flush=True)
+
+def _chunks(seq: List[Any], n: int):
+    for i in range(0, len(seq), n): yield seq[i:i+n]
+
+def line_embeds(title: str, lines: List[str]) -> List[discord.Embed]:
+    blocks, cur, size = [], [], 0
+    for l in lines:
+        l = l[:EMBED_CHARS - 1]
+        if cur and size + len(l) + 1 > EMBED_CHARS: blocks.append(cur); cur, size = [], 0
+        cur.append(l); size += len(l) + 1
+    if cur: blocks.append(cur)
+    embs = [discord.Embed(description="\n".join(b), color=0x5865F2) for b in blocks]
+    if embs: embs[0].title = title
+    return embs
+
+async def send_lines(interaction: discord.Interaction, title: str, lines: List[str]):
+    for embs in _chunks(line_embeds(title, lines), EMBEDS_PER_MSG): await interaction.followup.send(embeds=embs, ephemeral=True)
 
 @bot.event
 async def on_ready():
     print(f"✅ Bot online als {bot.user}", flush=True)
 
+@bot.event
+async def on_guild_channel_delete(ch: discord.abc.GuildChannel):
+    _ch_cache.pop(ch.id, None)
+
+@bot.event
+async def on_member_remove(m: discord.Member):
+    _user_cache.pop(m.id, None)
+
 @bot.event
 async def setup_hook():
+    await asyncio.to_thread(migrate_json)
     await sync_cmds()
     bot.loop.create_task(reminder_loop())
+    bot.loop.create_task(delete_worker())
 
 async def sync_cmds():
     g = discord.Object(id=GUILD_ID)
@@ -117,57 +397,88 @@ async def sync_cmds():
     print(f"📌 Remote Commands (Guild): {[c.name for c in remote]}", flush=True)
 
 # ===== REMINDER LOOP =====
+_rem_wake = asyncio.Event()
+
+def wake_reminders(): _rem_wake.set()
+
+def fire_times(e: Dict[str, Any]) -> List[float]:
+    ts = e["ts"]; sent = set(int(x) for x in e.get("sent", []))
+    return [ts - int(m) * 60 for m in e.get("reminders", []) if int(m) not in sent] + [ts]
+
+def reminder_heap(events: List[Dict[str, Any]]) -> List[Tuple[float, int]]:
+    h = [(ts, e["id"]) for e in events for ts in fire_times(e)]
+    heapq.heapify(h); return h
+
+async def send_target(tgt: Dict[str, Any], msgs: List[str]):
+    for msg in msgs:
+        if tgt["type"] == "channel": await ch_send(tgt["channel_id"], f"<@&{ROLLE_ID}> {msg}")
+        else: await dm_send_all(tgt["user_ids"], msg)
+
 async def reminder_loop():
     await bot.wait_until_ready()
     print("⏰ Reminder-Loop aktiv", flush=True)
+    heap: List[Tuple[float, int]] = []; src = None; next_compact = 0.0
     while not bot.is_closed():
         try:
-            d = load(); changed=False; n = now()
-            for e in d["events"]:
-                if e.get("cancelled"): 
-                    continue
-                dt = from_iso(e["datetime"])
+            d = await load()
+            if d is not src or _rem_wake.is_set():
+                _rem_wake.clear(); src = d; heap = reminder_heap(d["events"])
+            n_ts = time.time(); due = set()
+            while heap and heap[0][0] <= n_ts: due.add(heapq.heappop(heap)[1])
+            changed=False; expired=[]; sends=[]
+            if n_ts >= next_compact:
+                next_compact = n_ts + COMPACT_INTERVAL_SECONDS; changed, old = compact(d)
+                if old: await asyncio.to_thread(_append_archive_sync, old)
+            for eid in sorted(due):
+                e = d["_event_idx"].get(eid)
+                if not e or e.get("cancelled"): continue
+                ts = e["ts"]
                 rems = [int(x) for x in e.get("reminders", [])]
-                sent = set(int(x) for x in e.get("sent", []))
+                sent = set(int(x) for x in e.get("sent", [])); n_sent = len(sent)
 
+                msgs = []
                 for m in rems:
                     if m in sent: 
                         continue
-                    if n >= dt - timedelta(minutes=m) and n < dt + timedelta(hours=24):
-                        msg = reminder_msg(e["title"], dt, m)
-                        tgt = e["target"]
-                        if tgt["type"] == "channel":
-                            await ch_send(tgt["channel_id"], f"<@&{ROLLE_ID}> {msg}")
-                        else:
-                            for uid in tgt["user_ids"]:
-                                await dm_send(uid, msg)
-                        sent.add(m); e["sent"] = sorted(sent, reverse=True); changed=True
-
-                if n >= dt:
-                    rec = (e.get("recurrence") or "none").lower()
+                    if ts - m * 60 <= n_ts < ts + 86400:
+                        msgs.append(reminder_msg(e["title"], e["dt_fmt"], m))
+                        sent.add(m)
+                if msgs: sends.append(send_target(e["target"], msgs))
+                if len(sent) != n_sent: e["sent"] = sorted(sent, reverse=True); changed=True
+
+                if n_ts >= ts:
+                    rec = e.get("recurrence", "none")
                     if rec != "none":
-                        e["datetime"] = to_iso(next_occ(dt, rec))
+                        nxt = next_occ(from_iso(e["datetime"]), rec); e["datetime"] = to_iso(nxt); e["dt_fmt"] = fmt_dt(nxt); e["ts"] = nxt.timestamp()
                         e["sent"] = []
+                        resort_event(d, e)
+                        for ts in fire_times(e): heapq.heappush(heap, (ts, eid))
                     else:
-                        e["cancelled"] = True
+                        expired.append(e)
                     changed=True
 
-            if changed: save(d)
+            for e in expired:
+                if not e.get("cancelled"): archive_event(d, e)
+            if changed: schedule_save(d)
+            for r in await asyncio.gather(*sends, return_exceptions=True):
+                if isinstance(r, Exception): print(f"❌ Reminder-Versand fehlgeschlagen: {type(r).__name__}: {r}", flush=True)
         except Exception as ex:
             print(f"❌ Reminder-Loop Fehler: {type(ex).__name__}: {ex}", flush=True)
-        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+        wait = min(CHECK_INTERVAL_SECONDS, heap[0][0] - time.time()) if heap else CHECK_INTERVAL_SECONDS
+        try: await asyncio.wait_for(_rem_wake.wait(), max(0, wait))
+        except asyncio.TimeoutError: pass
 
 # ===== TODO PERMS =====
-def role_ids(m: discord.Member) -> Set[int]:
-    return {r.id for r in getattr(m, "roles", [])}
+def role_ids(m: discord.Member) -> FrozenSet[int]:
+    return frozenset(r.id for r in getattr(m, "roles", []))
 
-def todo_relevant(t: Dict[str, Any], m: discord.Member) -> bool:
+def todo_relevant(t: Dict[str, Any], mid: int, rids: FrozenSet[int]) -> bool:
     if t.get("deleted"): return False
     sc = t.get("scope", "public")
     if sc=="public": return True
-    if sc=="private": return int(t.get("created_by",0)) == m.id
-    if sc=="user": return int(t.get("assigned_user_id",0)) == m.id or int(t.get("created_by",0)) == m.id
-    if sc=="role": return int(t.get("assigned_role_id",0)) in role_ids(m) or int(t.get("created_by",0)) == m.id
+    if sc=="private": return int(t.get("created_by",0)) == mid
+    if sc=="user": return int(t.get("assigned_user_id",0)) == mid or int(t.get("created_by",0)) == mid
+    if sc=="role": return int(t.get("assigned_role_id",0)) in rids or int(t.get("created_by",0)) == mid
     return False
 
 def todo_can_modify(t: Dict[str, Any], m: discord.Member) -> bool:
@@ -197,18 +508,21 @@ async def termin(interaction: discord.Interaction, datum: str, uhrzeit: str, tit
     await interaction.response.defer(ephemeral=True)
     try: dt = parse_dt(datum, uhrzeit)
     except: return await interaction.followup.send("❌ Ungültig. Beispiel: 08.02.2026 & 12:00", ephemeral=True)
+    try: rems = parse_reminders(erinnerung)
+    except ValueError: return await interaction.followup.send("❌ Erinnerung ungültig. Beispiel: 60,10,5 oder 1h,15m", ephemeral=True)
 
-    d = load(); eid = next_id(d, "next_event_id"); rems = parse_reminders(erinnerung)
-    d["events"].append({
-        "id": eid, "title": titel.strip(), "datetime": to_iso(dt),
-        "reminders": rems, "sent": [], "recurrence": wiederholung,
+    d = await load(); eid = next_id(d, "next_event_id")
+    ev = {
+        "id": eid, "title": titel.strip(), "datetime": to_iso(dt), "dt_fmt": fmt_dt(dt), "ts": dt.timestamp(),
+        "reminders": rems, "reminders_str": rems_str(rems), "sent": [], "recurrence": wiederholung,
         "cancelled": False, "target": {"type":"channel","channel_id":ERINNERUNGS_CHANNEL_ID},
         "created_by": interaction.user.id
-    })
-    save(d)
+    }
+    add_event(d, ev)
+    schedule_save(d); wake_reminders()
     rem_txt = ", ".join(f"{m}m" for m in rems) if rems else "—"
     await ch_send(ERINNERUNGS_CHANNEL_ID,
-        f"<@&{ROLLE_ID}> 📅 **Neuer Termin**\n📌 **{titel}**\n🕒 {dt.strftime('%d.%m.%Y %H:%M')} (Berlin)\n🔔 **Erinnerung:** {rem_txt} vorher\n🆔 ID: **{eid}**"
+        f"<@&{ROLLE_ID}> 📅 **Neuer Termin**\n📌 **{titel}**\n🕒 {ev['dt_fmt']} (Berlin)\n🔔 **Erinnerung:** {rem_txt} vorher\n🆔 ID: **{eid}**"
     )
     await interaction.followup.send(f"✅ Termin gespeichert. ID: **{eid}**", ephemeral=True)
 
@@ -222,57 +536,55 @@ async def ptermin(interaction: discord.Interaction, datum: str, uhrzeit: str, ti
     await interaction.response.defer(ephemeral=True)
     try: dt = parse_dt(datum, uhrzeit)
     except: return await interaction.followup.send("❌ Ungültig. Beispiel: 08.02.2026 & 12:00", ephemeral=True)
+    try: rems = parse_reminders(erinnerung)
+    except ValueError: return await interaction.followup.send("❌ Erinnerung ungültig. Beispiel: 60,10,5 oder 1h,15m", ephemeral=True)
 
     ids = {interaction.user.id} | {p.id for p in (person1,person2,person3,person4,person5) if p}
-    d = load(); eid = next_id(d, "next_event_id")
-    d["events"].append({
-        "id": eid, "title": titel.strip(), "datetime": to_iso(dt),
-        "reminders": parse_reminders(erinnerung), "sent": [],
+    d = await load(); eid = next_id(d, "next_event_id")
+    ev = {
+        "id": eid, "title": titel.strip(), "datetime": to_iso(dt), "dt_fmt": fmt_dt(dt), "ts": dt.timestamp(),
+        "reminders": rems, "reminders_str": rems_str(rems), "sent": [],
         "recurrence": wiederholung, "cancelled": False,
         "target": {"type":"dm","user_ids": sorted(ids)},
         "created_by": interaction.user.id
-    })
-    save(d)
+    }
+    add_event(d, ev)
+    schedule_save(d); wake_reminders()
     await interaction.followup.send(f"✅ Privater Termin gespeichert. ID: **{eid}**. Empfänger: **{len(ids)}**", ephemeral=True)
 
 @bot.tree.command(name="termine", description="Zeigt nur aktive (zukünftige) Termine")
 async def termine(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
-    d = load(); n = now()
-    evs = [e for e in d["events"] if not e.get("cancelled") and from_iso(e["datetime"]) >= n]
-    evs.sort(key=lambda e: from_iso(e["datetime"]))
+    d = await load(); evs = active_events(d)
     if not evs: return await interaction.followup.send("📭 Keine aktiven Termine.", ephemeral=True)
     lines=[]
     for e in evs[:25]:
-        dt = from_iso(e["datetime"])
-        rems = ",".join(str(m) for m in e.get("reminders", [])) or "—"
-        lines.append(f"**{e['id']}** · {dt.strftime('%d.%m.%Y %H:%M')} · **{e['title']}** · rem: {rems} · {e.get('recurrence','none')} · {e['target']['type']}")
-    await interaction.followup.send("\n".join(lines), ephemeral=True)
+        lines.append(f"**{e['id']}** · {e['dt_fmt']} · **{e['title']}** · rem: {e.get('reminders_str','—')} · {e.get('recurrence','none')} · {e['target']['type']}")
+    await send_lines(interaction, "📅 Aktive Termine", lines)
 
 @bot.tree.command(name="termine_all", description="Zeigt alle Termine (inkl. alte/abgesagte)")
-async def termine_all(interaction: discord.Interaction):
+@app_commands.describe(archiv="true = auch Termine älter als 30 Tage aus dem Archiv")
+async def termine_all(interaction: discord.Interaction, archiv: bool=False):
     await interaction.response.defer(ephemeral=True)
-    d = load()
-    evs = sorted(d["events"], key=lambda e: from_iso(e["datetime"]))
+    d = await load()
+    evs = all_events(d)[:25]
+    if archiv: evs = evs + await asyncio.to_thread(_read_archive_sync, 25)
     if not evs: return await interaction.followup.send("📭 Keine Termine gespeichert.", ephemeral=True)
     lines=[]
-    for e in evs[:25]:
-        dt = from_iso(e["datetime"])
-        rems = ",".join(str(m) for m in e.get("reminders", [])) or "—"
+    for e in evs:
         status = "abgesagt/erledigt" if e.get("cancelled") else "aktiv"
-        lines.append(f"**{e['id']}** · {dt.strftime('%d.%m.%Y %H:%M')} · **{e['title']}** · rem: {rems} · {e.get('recurrence','none')} · {e['target']['type']} · {status}")
-    await interaction.followup.send("\n".join(lines), ephemeral=True)
+        lines.append(f"**{e['id']}** · {e['dt_fmt']} · **{e['title']}** · rem: {e.get('reminders_str','—')} · {e.get('recurrence','none')} · {e['target']['type']} · {status}")
+    await send_lines(interaction, "📦 Alle Termine", lines)
 
 @bot.tree.command(name="termin_absagen", description="Sagt einen Termin ab (per ID)")
 @app_commands.describe(termin_id="ID aus /termine oder /termine_all")
 async def termin_absagen(interaction: discord.Interaction, termin_id: int):
     await interaction.response.defer(ephemeral=True)
-    d = load()
-    for e in d["events"]:
-        if int(e.get("id",-1)) == int(termin_id) and not e.get("cancelled"):
-            e["cancelled"]=True; save(d)
-            return await interaction.followup.send(f"❌ Termin **{termin_id}** abgesagt.", ephemeral=True)
-    await interaction.followup.send("❌ Termin-ID nicht gefunden oder schon abgesagt.", ephemeral=True)
+    d = await load(); e = d["_event_idx"].get(termin_id)
+    if not e or e.get("cancelled"):
+        return await interaction.followup.send("❌ Termin-ID nicht gefunden oder schon abgesagt.", ephemeral=True)
+    archive_event(d, e); schedule_save(d)
+    await interaction.followup.send(f"❌ Termin **{termin_id}** abgesagt.", ephemeral=True)
 
 @bot.tree.command(name="termin_edit", description="Bearbeitet einen Termin (per ID)")
 @app_commands.describe(termin_id="ID", datum="Optional DD.MM.YYYY", uhrzeit="Optional HH:MM", titel="Optional", erinnerung="Optional z.B. 120,30,10", wiederholung="Optional")
@@ -280,27 +592,47 @@ async def termin_absagen(interaction: discord.Interaction, termin_id: int):
 async def termin_edit(interaction: discord.Interaction, termin_id: int, datum: Optional[str]=None, uhrzeit: Optional[str]=None,
                       titel: Optional[str]=None, erinnerung: Optional[str]=None, wiederholung: Optional[str]=None):
     await interaction.response.defer(ephemeral=True)
-    d = load()
-    ev = next((e for e in d["events"] if int(e.get("id",-1)) == int(termin_id) and not e.get("cancelled")), None)
-    if not ev: return await interaction.followup.send("❌ Termin-ID nicht gefunden.", ephemeral=True)
+    d = await load()
+    ev = d["_event_idx"].get(termin_id)
+    if not ev or ev.get("cancelled"): return await interaction.followup.send("❌ Termin-ID nicht gefunden.", ephemeral=True)
+    rems = None
+    if erinnerung is not None:
+        try: rems = parse_reminders(erinnerung)
+        except ValueError: return await interaction.followup.send("❌ Erinnerung ungültig. Beispiel: 60,10,5 oder 1h,15m", ephemeral=True)
+
+    ndt = None
+    if datum is not None or uhrzeit is not None:
+        cur = from_iso(ev["datetime"])
+        dstr = datum if datum is not None else f"{cur.day:02d}.{cur.month:02d}.{cur.year}"
+        tstr = uhrzeit if uhrzeit is not None else f"{cur.hour:02d}:{cur.minute:02d}"
+        try: ndt = parse_dt(dstr, tstr)
+        except: return await interaction.followup.send("❌ Neues Datum/Uhrzeit ungültig.", ephemeral=True)
 
     if titel and titel.strip(): ev["title"] = titel.strip()
-    if erinnerung is not None: ev["reminders"] = parse_reminders(erinnerung); ev["sent"] = []
+    if rems is not None:
+        ev["reminders"] = rems; ev["reminders_str"] = rems_str(rems); ev["sent"] = []
     if wiederholung is not None: ev["recurrence"] = wiederholung
+    if ndt is not None:
+        ev["datetime"] = to_iso(ndt); ev["dt_fmt"] = fmt_dt(ndt); ev["ts"] = ndt.timestamp(); ev["sent"]=[]
+        resort_event(d, ev)
 
-    if datum is not None or uhrzeit is not None:
-        cur = from_iso(ev["datetime"])
-        dstr = datum if datum is not None else cur.strftime("%d.%m.%Y")
-        tstr = uhrzeit if uhrzeit is not None else cur.strftime("%H:%M")
-        try:
-            ev["datetime"] = to_iso(parse_dt(dstr, tstr)); ev["sent"]=[]
-        except:
-            return await interaction.followup.send("❌ Neues Datum/Uhrzeit ungültig.", ephemeral=True)
-
-    save(d)
+    schedule_save(d); wake_reminders()
     await interaction.followup.send(f"✅ Termin **{termin_id}** aktualisiert.", ephemeral=True)
 
 # ===== TODOS =====
+def member_only(f):
+    @wraps(f)
+    async def wrapper(interaction: discord.Interaction, *args, **kwargs):
+        await interaction.response.defer(ephemeral=True)
+        if not isinstance(interaction.user, discord.Member):
+            return await interaction.followup.send("❌ Bitte im Server ausführen.", ephemeral=True)
+        return await f(interaction, *args, **kwargs)
+    return wrapper
+
+def _desc_snip(t: Dict[str, Any]) -> str:
+    desc = t.get("description") or ""
+    return " — " + desc[:60] + ("…" if len(desc)>60 else "") if desc else ""
+
 @bot.tree.command(name="todo", description="Erstellt ein Todo (public/private/user/role)")
 @app_commands.describe(titel="Kurzbeschreibung", beschreibung="Optional", privat="true=privat", user="Optional", rolle="Optional",
                       faellig_datum="Optional DD.MM.YYYY", faellig_uhrzeit="Optional HH:MM")
@@ -320,115 +652,92 @@ async def todo(interaction: discord.Interaction, titel: str, beschreibung: Optio
         try: due = to_iso(parse_dt(faellig_datum, faellig_uhrzeit or "23:59"))
         except: return await interaction.followup.send("❌ Fälligkeit ungültig. Beispiel: 10.03.2026 & 18:30", ephemeral=True)
 
-    d = load(); tid = next_id(d, "next_todo_id")
-    d["todos"].append({
+    d = await load(); tid = next_id(d, "next_todo_id"); n = now()
+    t = {
         "id": tid, "title": titel.strip(), "description": (beschreibung or "").strip(),
         "scope": scope, "assigned_user_id": au, "assigned_role_id": ar,
-        "created_by": interaction.user.id, "created_at": to_iso(now()),
-        "due": due, "done": False, "done_at": None, "deleted": False
-    })
-    save(d)
+        "created_by": interaction.user.id, "created_at": to_iso(n), "created_ts": n.timestamp(),
+        "due": due, "due_fmt": fmt_due(due), "due_ts": iso_ts(due), "done": False, "done_at": None, "done_ts": None, "done_fmt": "", "deleted": False
+    }
+    add_todo(d, t)
+    schedule_save(d)
     await interaction.followup.send(f"✅ Todo erstellt: **{tid}** · **{titel.strip()}**{fmt_due(due)}", ephemeral=True)
 
 @bot.tree.command(name="todos", description="Zeigt offene, relevante Todos")
+@member_only
 async def todos(interaction: discord.Interaction):
-    await interaction.response.defer(ephemeral=True)
-    if not isinstance(interaction.user, discord.Member):
-        return await interaction.followup.send("❌ Bitte im Server ausführen.", ephemeral=True)
     m: discord.Member = interaction.user
-    d = load()
-    items = [t for t in d["todos"] if not t.get("deleted") and not t.get("done") and todo_relevant(t, m)]
+    d = await load(); mid, rids = m.id, role_ids(m)
+    items = [t for t in todo_buckets(d)[0] if todo_relevant(t, mid, rids)]
     if not items: return await interaction.followup.send("📭 Keine offenen Todos.", ephemeral=True)
-
-    def key(t):
-        due = t.get("due"); due_dt = from_iso(due) if due else datetime.max.replace(tzinfo=TZ)
-        created = from_iso(t.get("created_at")) if t.get("created_at") else now()
-        return (due_dt, created)
-    items.sort(key=key)
-
-    lines=[]
-    for t in items[:40]:
-        desc = (t.get("description") or "")
-        if desc: desc = " — " + desc[:60] + ("…" if len(desc)>60 else "")
-        lines.append(f"⬜ **{t['id']}** · **{t['title']}**{fmt_due(t.get('due'))}{desc}")
+    lines = [f"⬜ **{t['id']}** · **{t['title']}**{t.get('due_fmt','')}{_desc_snip(t)}" for t in items[:40]]
     if len(items)>40: lines.append(f"… und {len(items)-40} weitere.")
-    await interaction.followup.send("\n".join(lines), ephemeral=True)
+    await send_lines(interaction, "📝 Offene Todos", lines)
 
 @bot.tree.command(name="oldtodos", description="Zeigt erledigte, relevante Todos")
+@member_only
 async def oldtodos(interaction: discord.Interaction):
-    await interaction.response.defer(ephemeral=True)
-    if not isinstance(interaction.user, discord.Member):
-        return await interaction.followup.send("❌ Bitte im Server ausführen.", ephemeral=True)
     m: discord.Member = interaction.user
-    d = load()
-    items = [t for t in d["todos"] if not t.get("deleted") and t.get("done") and todo_relevant(t, m)]
+    d = await load(); mid, rids = m.id, role_ids(m)
+    items = [t for t in todo_buckets(d)[1] if todo_relevant(t, mid, rids)]
     if not items: return await interaction.followup.send("📭 Keine erledigten Todos.", ephemeral=True)
-    items.sort(key=lambda t: from_iso(t["done_at"]) if t.get("done_at") else datetime.min.replace(tzinfo=TZ), reverse=True)
-
-    lines=[]
-    for t in items[:40]:
-        done_txt = ""
-        if t.get("done_at"):
-            done_txt = " · erledigt: " + from_iso(t["done_at"]).strftime("%d.%m.%Y %H:%M")
-        lines.append(f"✅ **{t['id']}** · **{t['title']}**{done_txt}")
+    lines = [f"✅ **{t['id']}** · **{t['title']}**{t.get('done_fmt','')}" for t in heapq.nlargest(40, items, key=done_key)]
     if len(items)>40: lines.append(f"… und {len(items)-40} weitere.")
-    await interaction.followup.send("\n".join(lines), ephemeral=True)
+    await send_lines(interaction, "✅ Erledigte Todos", lines)
 
 async def _todo_set_done(interaction: discord.Interaction, todo_id: int, done: bool):
-    await interaction.response.defer(ephemeral=True)
-    if not isinstance(interaction.user, discord.Member):
-        return await interaction.followup.send("❌ Bitte im Server ausführen.", ephemeral=True)
     m: discord.Member = interaction.user
-    d = load()
-    t = next((x for x in d["todos"] if int(x.get("id",-1)) == int(todo_id) and not x.get("deleted")), None)
-    if not t: return await interaction.followup.send("❌ Todo-ID nicht gefunden.", ephemeral=True)
+    d = await load()
+    t = d["_todo_idx"].get(todo_id)
+    if not t or t.get("deleted"): return await interaction.followup.send("❌ Todo-ID nicht gefunden.", ephemeral=True)
     if not todo_can_modify(t, m): return await interaction.followup.send("❌ Keine Rechte.", ephemeral=True)
-    t["done"] = done
-    t["done_at"] = to_iso(now()) if done else None
-    save(d)
+    set_done(t, done); schedule_save(d)
     await interaction.followup.send(("✅" if done else "↩️") + f" Todo **{todo_id}** {'abgehakt' if done else 'wieder offen'}.", ephemeral=True)
 
 @bot.tree.command(name="todo_done", description="Hakt ein Todo ab (per ID)")
 @app_commands.describe(todo_id="ID aus /todos")
+@member_only
 async def todo_done(interaction: discord.Interaction, todo_id: int):
     await _todo_set_done(interaction, todo_id, True)
 
 @bot.tree.command(name="todo_undo", description="Setzt ein Todo wieder auf offen (per ID)")
 @app_commands.describe(todo_id="ID aus /oldtodos")
+@member_only
 async def todo_undo(interaction: discord.Interaction, todo_id: int):
     await _todo_set_done(interaction, todo_id, False)
 
 @bot.tree.command(name="todo_delete", description="Löscht ein Todo (per ID)")
 @app_commands.describe(todo_id="ID")
+@member_only
 async def todo_delete(interaction: discord.Interaction, todo_id: int):
-    await interaction.response.defer(ephemeral=True)
-    if not isinstance(interaction.user, discord.Member):
-        return await interaction.followup.send("❌ Bitte im Server ausführen.", ephemeral=True)
     m: discord.Member = interaction.user
-    d = load()
-    t = next((x for x in d["todos"] if int(x.get("id",-1)) == int(todo_id) and not x.get("deleted")), None)
-    if not t: return await interaction.followup.send("❌ Todo-ID nicht gefunden.", ephemeral=True)
+    d = await load()
+    t = d["_todo_idx"].get(todo_id)
+    if not t or t.get("deleted"): return await interaction.followup.send("❌ Todo-ID nicht gefunden.", ephemeral=True)
     if not todo_can_modify(t, m): return await interaction.followup.send("❌ Keine Rechte.", ephemeral=True)
-    t["deleted"]=True; save(d)
+    t["deleted"]=True; schedule_save(d)
     await interaction.followup.send(f"🗑️ Todo **{todo_id}** gelöscht.", ephemeral=True)
 
 @bot.tree.command(name="todo_edit", description="Bearbeitet ein bestehendes Todo")
 @app_commands.describe(todo_id="ID", titel="Optional", beschreibung="Optional", privat="Optional",
                       user="Optional", rolle="Optional", faellig_datum="Optional (leer=entfernen)", faellig_uhrzeit="Optional")
+@member_only
 async def todo_edit(interaction: discord.Interaction, todo_id: int, titel: Optional[str]=None, beschreibung: Optional[str]=None,
                     privat: Optional[bool]=None, user: Optional[discord.Member]=None, rolle: Optional[discord.Role]=None,
                     faellig_datum: Optional[str]=None, faellig_uhrzeit: Optional[str]=None):
-    await interaction.response.defer(ephemeral=True)
-    if not isinstance(interaction.user, discord.Member):
-        return await interaction.followup.send("❌ Bitte im Server ausführen.", ephemeral=True)
     m: discord.Member = interaction.user
     if user and rolle: return await interaction.followup.send("❌ Bitte entweder user oder rolle (nicht beides).", ephemeral=True)
 
-    d = load()
-    t = next((x for x in d["todos"] if int(x.get("id",-1)) == int(todo_id) and not x.get("deleted")), None)
-    if not t: return await interaction.followup.send("❌ Todo-ID nicht gefunden.", ephemeral=True)
+    d = await load()
+    t = d["_todo_idx"].get(todo_id)
+    if not t or t.get("deleted"): return await interaction.followup.send("❌ Todo-ID nicht gefunden.", ephemeral=True)
     if not todo_can_modify(t, m): return await interaction.followup.send("❌ Keine Rechte.", ephemeral=True)
 
+    due = None
+    if faellig_datum is not None and faellig_datum.strip():
+        try: due = to_iso(parse_dt(faellig_datum, faellig_uhrzeit or "23:59"))
+        except: return await interaction.followup.send("❌ Fälligkeit ungültig.", ephemeral=True)
+
     if titel and titel.strip(): t["title"] = titel.strip()
     if beschreibung is not None: t["description"] = beschreibung.strip()
 
@@ -443,160 +752,182 @@ async def todo_edit(interaction: discord.Interaction, todo_id: int, titel: Optio
         t["scope"]="role"; t["assigned_role_id"]=rolle.id; t["assigned_user_id"]=None
 
     if faellig_datum is not None:
-        if faellig_datum.strip()=="":
-            t["due"]=None
-        else:
-            try: t["due"]=to_iso(parse_dt(faellig_datum, faellig_uhrzeit or "23:59"))
-            except: return await interaction.followup.send("❌ Fälligkeit ungültig.", ephemeral=True)
+        t["due"]=due; t["due_fmt"]=fmt_due(due); t["due_ts"]=iso_ts(due)
+        resort_todo(d, t)
 
-    save(d)
+    schedule_save(d)
     await interaction.followup.send(f"✅ Todo **{todo_id}** aktualisiert.", ephemeral=True)
 
 # ===== DASHBOARD (ephemeral) =====
-def dash_items(m: discord.Member, tab: str) -> List[Dict[str, Any]]:
-    d = load(); n = now()
-    if tab=="todos_open":
-        items=[t for t in d["todos"] if not t.get("deleted") and not t.get("done") and todo_relevant(t,m)]
-        def key(t):
-            due=t.get("due"); due_dt=from_iso(due) if due else datetime.max.replace(tzinfo=TZ)
-            created=from_iso(t.get("created_at")) if t.get("created_at") else n
-            return (due_dt, created)
-        items.sort(key=key); return items
-    if tab=="todos_done":
-        items=[t for t in d["todos"] if not t.get("deleted") and t.get("done") and todo_relevant(t,m)]
-        items.sort(key=lambda t: from_iso(t["done_at"]) if t.get("done_at") else datetime.min.replace(tzinfo=TZ), reverse=True); return items
-    if tab=="events_active":
-        items=[e for e in d["events"] if not e.get("cancelled") and from_iso(e["datetime"]) >= n]
-        items.sort(key=lambda e: from_iso(e["datetime"])); return items
-    items=list(d["events"]); items.sort(key=lambda e: from_iso(e["datetime"])); return items
+def _tab_todos_open(d: Dict[str, Any], mid: int, rids: FrozenSet[int]) -> List[Dict[str, Any]]:
+    return [t for t in todo_buckets(d)[0] if todo_relevant(t,mid,rids)]
+
+def _tab_todos_done(d: Dict[str, Any], mid: int, rids: FrozenSet[int]) -> List[Dict[str, Any]]:
+    return [t for t in todo_buckets(d)[1] if todo_relevant(t,mid,rids)]
+
+def _tab_events_active(d: Dict[str, Any], mid: int, rids: FrozenSet[int]) -> List[Dict[str, Any]]:
+    return active_events(d)
+
+def _tab_events_all(d: Dict[str, Any], mid: int, rids: FrozenSet[int]) -> List[Dict[str, Any]]:
+    return all_events(d)
+
+DASH_ITEMS = {"todos_open": _tab_todos_open, "todos_done": _tab_todos_done, "events_active": _tab_events_active, "events_all": _tab_events_all}
+
+DASH_RANK = {"todos_done": done_key}
 
 def dash_page(items: List[Dict[str, Any]], page: int) -> Tuple[List[Dict[str, Any]], int, int]:
     total=len(items); pages=max(1,(total+PAGE_SIZE-1)//PAGE_SIZE)
     page=max(0,min(page,pages-1))
     return items[page*PAGE_SIZE:page*PAGE_SIZE+PAGE_SIZE], page, pages
 
-def dash_embed(m: discord.Member, tab: str, page: int, sel: Optional[int]) -> discord.Embed:
-    items=dash_items(m, tab)
-    sl, page, pages = dash_page(items, page)
-    title={"todos_open":"📝 Todos – offen","todos_done":"✅ Todos – erledigt","events_active":"📅 Termine – aktiv","events_all":"📦 Termine – alle"}[tab]
+DASH_TITLES = {"todos_open":"📝 Todos – offen","todos_done":"✅ Todos – erledigt","events_active":"📅 Termine – aktiv","events_all":"📦 Termine – alle"}
+SCOPE_DE = {"public":"öffentlich","private":"privat","user":"user","role":"rolle"}
+DASH_SIG_KEYS = ("id", "title", "description", "scope", "due_fmt", "done", "dt_fmt", "reminders_str", "recurrence", "cancelled")
+
+def dash_sig(tab: str, sl: List[Dict[str, Any]], page: int, pages: int, sel: Tuple[int, ...]) -> Tuple:
+    return (tab, page, pages, sel, tuple(tuple(map(it.get, DASH_SIG_KEYS)) for it in sl))
+
+def dash_render(tab: str, sl: List[Dict[str, Any]], page: int, pages: int, sel: Tuple[int, ...]) -> Tuple[discord.Embed, List[discord.SelectOption]]:
+    title=DASH_TITLES[tab]
     e=discord.Embed(title=f"🧠 Dashboard · {title}", color=0x5865F2)
-    e.set_footer(text=f"Seite {page+1}/{pages} · Auswahl: {sel if sel else '—'}")
-    if not sl: e.description="📭 Keine Einträge."; return e
+    e.set_footer(text=f"Seite {page+1}/{pages} · Auswahl: {', '.join(map(str, sel)) or '—'}")
+    if not sl:
+        e.description="📭 Keine Einträge."
+        return e, [discord.SelectOption(label="Keine Einträge", value="0")]
+    opts=[]; parts=[]
     if tab.startswith("todos"):
         for t in sl:
             st="✅" if t.get("done") else "⬜"
-            sc={"public":"öffentlich","private":"privat","user":"user","role":"rolle"}.get(t.get("scope","public"),t.get("scope","public"))
+            sc=t.get("scope","public"); sc=SCOPE_DE.get(sc, sc)
             desc=(t.get("description") or "—")
-            e.add_field(name=f"{st} ID {t['id']} · {t.get('title','—')} ({sc}){fmt_due(t.get('due'))}",
-                        value=desc[:180]+("…" if len(desc)>180 else ""), inline=False)
+            parts.append(f"**{st} ID {t['id']} · {t.get('title','—')} ({sc}){t.get('due_fmt','')}**\n{desc[:180]}{'…' if len(desc)>180 else ''}")
+            opts.append(discord.SelectOption(label=f"{t['id']} · {t.get('title','—')[:60]}", description=f"todo {t.get('scope','public')}"[:100], value=str(t["id"])))
     else:
         for it in sl:
-            dt=from_iso(it["datetime"]); st="❌" if it.get("cancelled") else "📅"
-            rem=",".join(str(x) for x in it.get("reminders",[])) or "—"
-            e.add_field(name=f"{st} ID {it['id']} · {it.get('title','—')}",
-                        value=f"🕒 {dt.strftime('%d.%m.%Y %H:%M')} · 🔔 {rem} · 🔁 {it.get('recurrence','none')} · 🎯 {it.get('target',{}).get('type','channel')}",
-                        inline=False)
-    return e
-
-def dash_opts(m: discord.Member, tab: str, page: int) -> List[discord.SelectOption]:
-    items=dash_items(m, tab); sl, _, _ = dash_page(items, page)
-    if not sl: return [discord.SelectOption(label="Keine Einträge", value="0")]
-    out=[]
-    for it in sl:
-        if tab.startswith("todos"):
-            out.append(discord.SelectOption(label=f"{it['id']} · {it.get('title','—')[:60]}", description=f"todo {it.get('scope','public')}"[:100], value=str(it["id"])))
-        else:
-            dt=from_iso(it["datetime"]).strftime("%d.%m.%Y %H:%M")
-            out.append(discord.SelectOption(label=f"{it['id']} · {it.get('title','—')[:50]}", description=dt, value=str(it["id"])))
-    return out
+            st="❌" if it.get("cancelled") else "📅"
+            parts.append(f"**{st} ID {it['id']} · {it.get('title','—')}**\n🕒 {it['dt_fmt']} · 🔔 {it.get('reminders_str','—')} · 🔁 {it.get('recurrence','none')} · 🎯 {it.get('target',{}).get('type','channel')}")
+            opts.append(discord.SelectOption(label=f"{it['id']} · {it.get('title','—')[:50]}", description=it["dt_fmt"], value=str(it["id"])))
+    e.description="\n\n".join(parts)[:4096]
+    return e, opts
+
+_dash_memo: Dict[Tuple, Tuple[discord.Embed, List[discord.SelectOption], int, Tuple]] = {}
+_tab_memo: Dict[Tuple, List[Dict[str, Any]]] = {}
+_dash_memo_ver = -1
+
+def dash_tab_items(d: Dict[str, Any], mid: int, rids: FrozenSet[int], tab: str) -> List[Dict[str, Any]]:
+    key = (mid, rids, tab); items = _tab_memo.get(key)
+    if items is None:
+        items = _tab_memo[key] = DASH_ITEMS[tab](d, mid, rids)
+        if tab in DASH_RANK: items.sort(key=DASH_RANK[tab], reverse=True)
+    return items
+
+def dash_state(d: Dict[str, Any], m: discord.Member, tab: str, page: int, sel: Tuple[int, ...]) -> Tuple[discord.Embed, List[discord.SelectOption], int, Tuple]:
+    global _dash_memo_ver
+    if _dash_memo_ver != _data_version or len(_dash_memo) >= 256:
+        _dash_memo.clear(); _tab_memo.clear(); _dash_memo_ver = _data_version
+    mid, rids = m.id, role_ids(m); key = (mid, rids, tab, page, sel)
+    r = _dash_memo.get(key)
+    if r is None:
+        sl, pg, pages = dash_page(dash_tab_items(d, mid, rids, tab), page)
+        r = _dash_memo[key] = (*dash_render(tab, sl, pg, pages, sel), pg, dash_sig(tab, sl, pg, pages, sel))
+    return r
 
 class DashSelect(discord.ui.Select):
-    def __init__(self, view: "DashView"):
+    def __init__(self, view: "DashView", options: List[discord.SelectOption]):
         self.v=view
-        super().__init__(placeholder="Eintrag auswählen…", options=dash_opts(view.member, view.tab, view.page), min_values=1, max_values=1)
+        super().__init__(placeholder="Einträge auswählen…", options=options, min_values=1, max_values=len(options))
     async def callback(self, interaction: discord.Interaction):
-        if self.values and self.values[0]!="0": self.v.selected=int(self.values[0])
+        if ids := tuple(int(v) for v in self.values if v!="0"): self.v.selected=ids
         await self.v.refresh(interaction)
 
 class DashView(discord.ui.View):
-    def __init__(self, member: discord.Member, tab="todos_open", page=0, selected: Optional[int]=None):
+    def __init__(self, member: discord.Member, opts: List[discord.SelectOption], tab="todos_open", page=0, selected: Tuple[int, ...]=(), sig: Optional[Tuple]=None):
         super().__init__(timeout=600)
-        self.member=member; self.owner=member.id; self.tab=tab; self.page=page; self.selected=selected
-        self.add_item(DashSelect(self))
+        self.member=member; self.owner=member.id; self.last_sig=sig; self.apply_state(tab, page, selected)
+        self.sel=DashSelect(self, opts); self.add_item(self.sel)
+
+    def apply_state(self, tab: str, page: int, selected: Tuple[int, ...]=()):
+        self.tab=tab; self.page=page; self.selected=selected
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if interaction.user.id != self.owner:
             await interaction.response.send_message("❌ Nicht dein Dashboard.", ephemeral=True); return False
         return True
 
-    def rebuild(self): return DashView(self.member, self.tab, self.page, self.selected)
-
     async def refresh(self, interaction: discord.Interaction):
-        emb=dash_embed(self.member, self.tab, self.page, self.selected)
-        await interaction.response.edit_message(embed=emb, view=self.rebuild())
+        emb, opts, self.page, sig = dash_state(await load(), self.member, self.tab, self.page, self.selected)
+        if sig == self.last_sig:
+            if not interaction.response.is_done(): await interaction.response.defer()
+            return
+        self.sel.options = list(opts); self.sel.max_values = len(opts); self.last_sig = sig
+        if interaction.response.is_done(): await interaction.edit_original_response(embed=emb, view=self)
+        else: await interaction.response.edit_message(embed=emb, view=self)
+
+    async def with_todo(self, interaction: discord.Interaction, mutate: Callable[[Dict[str, Any]], Any], msg: str):
+        if not self.tab.startswith("todos") or not self.selected:
+            return await interaction.response.send_message("❌ Erst ein Todo auswählen.", ephemeral=True)
+        await interaction.response.defer()
+        d=await load(); ts=[t for i in self.selected if (t := d["_todo_idx"].get(i)) and not t.get("deleted")]
+        if not ts: return await interaction.followup.send("❌ Todo nicht gefunden.", ephemeral=True)
+        denied = [str(t["id"]) for t in ts if not todo_can_modify(t, self.member)]
+        if not (ts := [t for t in ts if todo_can_modify(t, self.member)]): return await interaction.followup.send("❌ Keine Rechte.", ephemeral=True)
+        for t in ts: mutate(t)
+        schedule_save(d)
+        msg = msg.format(", ".join(str(t["id"]) for t in ts))
+        await self.applied(interaction, msg + (f"\n❌ Keine Rechte für Todo {', '.join(denied)}." if denied else ""))
+
+    async def applied(self, interaction: discord.Interaction, msg: str):
+        self.apply_state(self.tab, self.page)
+        await asyncio.gather(self.refresh(interaction), interaction.followup.send(msg, ephemeral=True))
 
     @discord.ui.button(label="📝", style=discord.ButtonStyle.primary, row=1)
-    async def t1(self, interaction: discord.Interaction, _): self.tab="todos_open"; self.page=0; self.selected=None; await self.refresh(interaction)
+    async def t1(self, interaction: discord.Interaction, _): self.apply_state("todos_open", 0); await self.refresh(interaction)
     @discord.ui.button(label="✅", style=discord.ButtonStyle.secondary, row=1)
-    async def t2(self, interaction: discord.Interaction, _): self.tab="todos_done"; self.page=0; self.selected=None; await self.refresh(interaction)
+    async def t2(self, interaction: discord.Interaction, _): self.apply_state("todos_done", 0); await self.refresh(interaction)
     @discord.ui.button(label="📅", style=discord.ButtonStyle.success, row=1)
-    async def t3(self, interaction: discord.Interaction, _): self.tab="events_active"; self.page=0; self.selected=None; await self.refresh(interaction)
+    async def t3(self, interaction: discord.Interaction, _): self.apply_state("events_active", 0); await self.refresh(interaction)
     @discord.ui.button(label="📦", style=discord.ButtonStyle.secondary, row=1)
-    async def t4(self, interaction: discord.Interaction, _): self.tab="events_all"; self.page=0; self.selected=None; await self.refresh(interaction)
+    async def t4(self, interaction: discord.Interaction, _): self.apply_state("events_all", 0); await self.refresh(interaction)
 
     @discord.ui.button(label="⬅️", style=discord.ButtonStyle.secondary, row=2)
-    async def prev(self, interaction: discord.Interaction, _): self.page=max(0,self.page-1); self.selected=None; await self.refresh(interaction)
+    async def prev(self, interaction: discord.Interaction, _): self.apply_state(self.tab, max(0,self.page-1)); await self.refresh(interaction)
     @discord.ui.button(label="➡️", style=discord.ButtonStyle.secondary, row=2)
-    async def nxt(self, interaction: discord.Interaction, _): self.page+=1; self.selected=None; await self.refresh(interaction)
+    async def nxt(self, interaction: discord.Interaction, _): self.apply_state(self.tab, self.page+1); await self.refresh(interaction)
     @discord.ui.button(label="🔄", style=discord.ButtonStyle.secondary, row=2)
     async def ref(self, interaction: discord.Interaction, _): await self.refresh(interaction)
 
     @discord.ui.button(label="✅ Done", style=discord.ButtonStyle.success, row=3)
     async def done(self, interaction: discord.Interaction, _):
-        if not self.tab.startswith("todos") or not self.selected:
-            return await interaction.response.send_message("❌ Erst ein Todo auswählen.", ephemeral=True)
-        d=load(); t=next((x for x in d["todos"] if int(x.get("id",-1))==self.selected and not x.get("deleted")), None)
-        if not t: return await interaction.response.send_message("❌ Todo nicht gefunden.", ephemeral=True)
-        if not todo_can_modify(t, self.member): return await interaction.response.send_message("❌ Keine Rechte.", ephemeral=True)
-        t["done"]=True; t["done_at"]=to_iso(now()); save(d)
-        await interaction.response.send_message(f"✅ Todo {self.selected} erledigt.", ephemeral=True)
+        await self.with_todo(interaction, lambda t: set_done(t, True), "✅ Todo {} erledigt.")
 
     @discord.ui.button(label="↩️ Undo", style=discord.ButtonStyle.primary, row=3)
     async def undo(self, interaction: discord.Interaction, _):
-        if not self.tab.startswith("todos") or not self.selected:
-            return await interaction.response.send_message("❌ Erst ein Todo auswählen.", ephemeral=True)
-        d=load(); t=next((x for x in d["todos"] if int(x.get("id",-1))==self.selected and not x.get("deleted")), None)
-        if not t: return await interaction.response.send_message("❌ Todo nicht gefunden.", ephemeral=True)
-        if not todo_can_modify(t, self.member): return await interaction.response.send_message("❌ Keine Rechte.", ephemeral=True)
-        t["done"]=False; t["done_at"]=None; save(d)
-        await interaction.response.send_message(f"↩️ Todo {self.selected} wieder offen.", ephemeral=True)
+        await self.with_todo(interaction, lambda t: set_done(t, False), "↩️ Todo {} wieder offen.")
 
     @discord.ui.button(label="🗑️", style=discord.ButtonStyle.danger, row=3)
     async def delete(self, interaction: discord.Interaction, _):
-        if not self.tab.startswith("todos") or not self.selected:
-            return await interaction.response.send_message("❌ Erst ein Todo auswählen.", ephemeral=True)
-        d=load(); t=next((x for x in d["todos"] if int(x.get("id",-1))==self.selected and not x.get("deleted")), None)
-        if not t: return await interaction.response.send_message("❌ Todo nicht gefunden.", ephemeral=True)
-        if not todo_can_modify(t, self.member): return await interaction.response.send_message("❌ Keine Rechte.", ephemeral=True)
-        t["deleted"]=True; save(d)
-        await interaction.response.send_message(f"🗑️ Todo {self.selected} gelöscht.", ephemeral=True)
+        await self.with_todo(interaction, lambda t: t.__setitem__("deleted", True), "🗑️ Todo {} gelöscht.")
 
     @discord.ui.button(label="❌ Termin", style=discord.ButtonStyle.danger, row=4)
     async def cancel_ev(self, interaction: discord.Interaction, _):
         if not self.tab.startswith("events") or not self.selected:
             return await interaction.response.send_message("❌ Erst Termin auswählen.", ephemeral=True)
-        d=load(); ev=next((x for x in d["events"] if int(x.get("id",-1))==self.selected), None)
-        if not ev: return await interaction.response.send_message("❌ Termin nicht gefunden.", ephemeral=True)
-        ev["cancelled"]=True; save(d)
-        await interaction.response.send_message(f"❌ Termin {self.selected} abgesagt.", ephemeral=True)
+        await interaction.response.defer()
+        d=await load(); evs=[ev for i in self.selected if (ev := d["_event_idx"].get(i))]
+        if not evs: return await interaction.followup.send("❌ Termin nicht gefunden.", ephemeral=True)
+        if not (evs := [ev for ev in evs if not ev.get("cancelled")]): return await interaction.followup.send("❌ Termin schon abgesagt.", ephemeral=True)
+        for ev in evs: archive_event(d, ev)
+        schedule_save(d)
+        await self.applied(interaction, f"❌ Termin {', '.join(str(ev['id']) for ev in evs)} abgesagt.")
 
 @bot.tree.command(name="dashboard", description="Interaktives Dashboard (Todos + Termine)")
 async def dashboard(interaction: discord.Interaction):
     if not isinstance(interaction.user, discord.Member):
         return await interaction.response.send_message("❌ Bitte im Server ausführen.", ephemeral=True)
-    tab="todos_open"; page=0
-    await interaction.response.send_message(embed=dash_embed(interaction.user, tab, page, None), view=DashView(interaction.user, tab, page, None), ephemeral=True)
+    tab="todos_open"; emb, opts, page, sig = dash_state(await load(), interaction.user, tab, 0, ())
+    await interaction.response.send_message(embed=emb, view=DashView(interaction.user, list(opts), tab, page, sig=sig), ephemeral=True)
 
 # ===== START =====
 if __name__ == "__main__":
-    bot.run(BOT_TOKEN)
+    if sys.argv[1:2] == ["pretty"]: pretty_dump()
+    else: bot.run(BOT_TOKEN)